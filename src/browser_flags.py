@@ -0,0 +1,22 @@
+# Chromium launch flags shared by the CLI and the test suite's browser.
+# Kept in a side-effect-free module so tests can import it without pulling in src.main.
+
+# "Fast CI" flags: skip GPU probing, extensions, translate, sync and background
+# networking that Chromium otherwise spins up on every cold start.
+# No --disable-features here: Chromium keeps only the last copy of a repeated switch, so it
+# would replace Playwright's own --disable-features list (which already covers Translate
+# and BackForwardCache).
+CHROMIUM_ARGS = [
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--disable-translate",
+    "--disable-sync",
+    "--metrics-recording-only",
+    "--no-first-run",
+    "--mute-audio",
+    "--disable-renderer-backgrounding",
+]
@@ -1,8 +1,11 @@
 import os
+import re
 import sys
 import time
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from urllib.parse import urljoin, urlparse
+from typing import Dict, List
 import argparse
 
 from dotenv import load_dotenv
@@ -21,6 +24,9 @@ from playwright.sync_api import (
     Error as PWError,
 )
 
+from .browser_flags import CHROMIUM_ARGS
+from .session import DEFAULT_STATE_PATH, load_session, save_session
+
 install(show_locals=False)
 console = Console()
 
@@ -34,70 +40,106 @@ def log(msg: str) -> None:
 ARTIFACTS_DIR = Path("artifacts"); ARTIFACTS_DIR.mkdir(exist_ok=True)
 
 class AutomationFailure(RuntimeError): ...
-class ProductNotFound(AutomationFailure): ...
 
 def ts() -> str: return time.strftime("%Y%m%d_%H%M%S")
 
 def save_artifacts(page, label: str) -> None:
+    # Viewport PNG by default; full-page shots and the DOM dump are opt-in (both are slow).
     try:
-        png = ARTIFACTS_DIR / f"{ts()}_{label}.png"
-        html = ARTIFACTS_DIR / f"{ts()}_{label}.html"
-        page.screenshot(path=str(png), full_page=True)
-        html.write_text(page.content(), encoding="utf-8")
-        log(f"[yellow]Saved artifacts:[/] {png.name}, {html.name}")
+        now = ts()   # one stamp so the png/html pair always matches
+        png = ARTIFACTS_DIR / f"{now}_{label}.png"
+        page.screenshot(path=str(png), full_page=os.getenv("PW_FULL_PAGE_SCREENSHOT", "0") == "1")
+        saved = [png.name]
+        if os.getenv("PW_SAVE_HTML", "0") == "1":
+            html = ARTIFACTS_DIR / f"{now}_{label}.html"
+            html.write_text(page.content(), encoding="utf-8")
+            saved.append(html.name)
+        log(f"[yellow]Saved artifacts:[/] {', '.join(saved)}")
     except Exception as e:
         log(f"[red]Failed to save artifacts:[/] {e}")
 
 # ---------------- Helpers ----------------
+@lru_cache(maxsize=256)
 def _norm(s: str) -> str:
     return " ".join(s.split()).strip().casefold()
 
+_AMT_RE = re.compile(r"\$[0-9]+(?:\.[0-9]{2})?")
+
+def _amount(s: str) -> str:
+    # "Item total: $39.98" -> "$39.98" ("" if no amount)
+    m = _AMT_RE.search(s or "")
+    return m.group(0) if m else ""
+
+# Scrolling is purely cosmetic for Playwright's click/fill; only worth a round-trip
+# when someone is watching (--headful) or PW_NO_SCROLL=0. Set in run().
+SCROLL_INTO_VIEW = False
+
 def _scroll_into_view(el):
+    if not SCROLL_INTO_VIEW:
+        return
     try: el.scroll_into_view_if_needed(timeout=2000)
     except Exception: pass
 
 def _print_notfound(names: List[str]):
     # Single deterministic NOTFOUND line (as you requested).
-    unique = [n for i, n in enumerate(names) if n not in names[:i]]
+    unique = list(dict.fromkeys(names))   # order-preserving dedup
     if len(unique) == 1:
         console.print(f"NOTFOUND: Product '{unique[0]}' not found")
     else:
         console.print("NOTFOUND: Products not found: " + "; ".join(unique))
 
 # -------------- Navigation ---------------
+USERNAME_SEL       = 'input[data-test="username"], #user-name, input[name="user-name"]'
+PASSWORD_SEL       = 'input[data-test="password"], #password, input[name="password"]'
+LOGIN_BTN_SEL      = '[data-test="login-button"], input[type="submit"], button[type="submit"]'
+INVENTORY_READY_SEL = "[data-test='inventory-container'], #inventory_container, .inventory_list, .inventory_item"
+
 @retry(reraise=True, stop=stop_after_attempt(3),
        wait=wait_exponential(multiplier=0.5, min=0.5, max=4),
        retry=retry_if_exception_type((PWTimeoutError, PWError)))
-def goto_with_retry(page, url: str):
-    page.goto(url, wait_until="domcontentloaded")
-    page.wait_for_load_state("networkidle", timeout=12000)
+def goto_with_retry(page, url: str, ready_selector: str = ""):
+    # Return at first byte; readiness is the caller's next selector wait (or ready_selector).
+    page.goto(url, wait_until="commit")
+    if ready_selector:
+        page.wait_for_selector(ready_selector, timeout=15000)
 
 def login(page, username: str, password: str):
     # Username
     try: page.get_by_test_id("username").fill(username)
-    except Exception: page.locator('input[data-test="username"], #user-name, input[name="user-name"]').first.fill(username)
+    except Exception: page.locator(USERNAME_SEL).first.fill(username)
     # Password
     try: page.get_by_test_id("password").fill(password)
-    except Exception: page.locator('input[data-test="password"], #password, input[name="password"]').first.fill(password)
+    except Exception: page.locator(PASSWORD_SEL).first.fill(password)
     # Login
     try: page.get_by_test_id("login-button").click()
-    except Exception: page.locator('[data-test="login-button"], input[type="submit"], button[type="submit"]').first.click()
+    except Exception: page.locator(LOGIN_BTN_SEL).first.click()
 
-    # Verify inventory loaded
-    page.wait_for_load_state("domcontentloaded", timeout=12000)
-    page.wait_for_selector(
-        "[data-test='inventory-container'], #inventory_container, .inventory_list, .inventory_item",
-        timeout=15000
-    )
-    page.wait_for_load_state("networkidle", timeout=12000)
+    # Verify inventory loaded (the selector is the real gate, no load-state waits)
+    page.wait_for_selector(INVENTORY_READY_SEL, timeout=15000)
+
+# ---------------- Session ----------------
+# Saved-session file helpers live in src/session.py (pure file/JSON, unit-tested).
+def restore_session(page, app_url: str) -> bool:
+    """
+    Open the inventory directly using a restored session.
+    Returns True if we landed on the inventory, False if the site bounced us to login
+    (or the restore itself failed).
+    """
+    try:
+        page.goto(urljoin(app_url, "inventory.html"), wait_until="commit")
+        page.wait_for_selector(f"{INVENTORY_READY_SEL}, {LOGIN_BTN_SEL}", timeout=15000)
+        return page.locator(INVENTORY_READY_SEL).count() > 0
+    except (PWTimeoutError, PWError):
+        return False   # caller falls back to a normal login
 
 # ---------- Product discovery ------------
 CARD_SEL_PRIMARY   = "[data-test='inventory-item']"
 CARD_SEL_FALLBACK  = ".inventory_item"
 NAME_SEL           = "[data-test='inventory-item-name'], .inventory_item_name"
 PRICE_SEL          = "[data-test='inventory-item-price'], .inventory_item_price"
-BTN_ADD_SEL        = "button:has-text('Add to cart'), [data-test*='add-to-cart']"
-BTN_REMOVE_SEL     = "button:has-text('Remove'), [data-test*='remove']"
+# Plain CSS (no :has-text) because these are used inside page.evaluate querySelector()
+BTN_ADD_SEL        = "[data-test*='add-to-cart']"
+BTN_REMOVE_SEL     = "[data-test*='remove']"
 CART_BADGE_SEL     = ".shopping_cart_badge, [data-test='shopping-cart-badge']"
 CART_LINK_SEL      = "[data-test='shopping-cart-link'], .shopping_cart_link, a[href*='cart']"
 CHECKOUT_BTN_SEL   = "[data-test='checkout'], button:has-text('Checkout')"
@@ -111,114 +153,126 @@ TAX_SEL            = "[data-test='tax-label'], .summary_tax_label"
 TOTAL_SEL          = "[data-test='total-label'], .summary_total_label"
 ORDER_OK_SEL       = "[data-test='complete-header'], .complete-header"
 
-def _cards_locator(page):
-    cards = page.locator(CARD_SEL_PRIMARY)
-    if cards.count() == 0:
-        cards = page.locator(CARD_SEL_FALLBACK)
-    return cards
+# One CDP call returns every card's name + price (instead of per-card inner_text()).
+_INVENTORY_JS = """
+(els, [nameSel, priceSel]) => els.map(e => ({
+    name: (e.querySelector(nameSel)?.innerText || "").trim(),
+    price: (e.querySelector(priceSel)?.innerText || "").trim(),
+}))
+"""
 
-def _find_product_card(page, product_name: str):
-    target = _norm(product_name)
+@retry(reraise=True, stop=stop_after_attempt(2), wait=wait_fixed(0.6),
+       retry=retry_if_exception_type((PWTimeoutError, AutomationFailure)))
+def _read_inventory(page) -> List[dict]:
     page.wait_for_selector(f"{CARD_SEL_PRIMARY}, {CARD_SEL_FALLBACK}", timeout=15000)
-    cards = _cards_locator(page)
-    count = cards.count()
-    if count == 0:
+    sel = CARD_SEL_PRIMARY if page.locator(CARD_SEL_PRIMARY).count() > 0 else CARD_SEL_FALLBACK
+    cards = page.eval_on_selector_all(sel, _INVENTORY_JS, [NAME_SEL, PRICE_SEL])
+    if not cards:
         raise AutomationFailure("No inventory cards present")
+    empty = [c["name"] for c in cards if not c["price"]]
+    if empty:
+        # Usually a half-rendered list; raising here lets the retry re-read it
+        raise AutomationFailure(f"Price text empty for product(s): {'; '.join(empty)}")
+    return cards
 
-    for i in range(count):
-        card = cards.nth(i)
-        name_loc = card.locator(NAME_SEL).first
-        try:
-            name_loc.wait_for(timeout=3000)
-            _scroll_into_view(name_loc)
-            name_text = name_loc.inner_text().strip()
-        except Exception:
-            continue
-        if _norm(name_text) == target:
-            return card
-
-    raise ProductNotFound(f"Product '{product_name}' not found")
-
-@retry(reraise=True, stop=stop_after_attempt(2), wait=wait_fixed(0.6),
-       retry=retry_if_exception_type((PWTimeoutError, AutomationFailure)))
-def extract_price_for(page, product_name: str) -> str:
-    card = _find_product_card(page, product_name)
-    price_loc = card.locator(PRICE_SEL).first
-    price_loc.wait_for(timeout=8000)
-    _scroll_into_view(price_loc)
-    price = price_loc.inner_text().strip()
-    if not price:
-        raise AutomationFailure(f"Price text empty for product '{product_name}'")
-    return price
+# Inventory is static after login: run() reads it once and derives both maps from that list.
+def _build_name_index(cards: List[dict]) -> Dict[str, int]:
+    """Map normalized product name -> card index."""
+    index: Dict[str, int] = {}
+    for i, c in enumerate(cards):
+        index.setdefault(_norm(c["name"]), i)   # first card wins, like the old linear scan
+    return index
+
+def _price_map(cards: List[dict]) -> Dict[str, str]:
+    """Map normalized product name -> price text."""
+    prices: Dict[str, str] = {}
+    for c in cards:
+        prices.setdefault(_norm(c["name"]), c["price"])
+    return prices
 
 # --------- Add-to-cart + Cart helpers ----
-def add_to_cart_idempotent(page, product_name: str) -> str:
-    """
-    Adds product to cart if not already added.
-    Returns: "added" or "already"
-    """
-    card = _find_product_card(page, product_name)
-
-    # Already in cart?
-    remove_btn = card.locator(BTN_REMOVE_SEL).first
-    if remove_btn.count() > 0:
-        try:
-            remove_btn.wait_for(timeout=800)
-            return "already"
-        except Exception:
-            pass
-
-    add_btn = card.locator(BTN_ADD_SEL).first
-    add_btn.wait_for(timeout=8000)
-    _scroll_into_view(add_btn)
-    add_btn.click()
-
-    # Confirm flipped
-    remove_btn = card.locator(BTN_REMOVE_SEL).first
-    remove_btn.wait_for(timeout=8000)
-
-    # Badge appears
-    page.locator(CART_BADGE_SEL).first.wait_for(timeout=8000)
-    return "added"
-
 def open_cart(page):
     link = page.locator(CART_LINK_SEL).first
     link.wait_for(timeout=8000); _scroll_into_view(link); link.click()
     page.wait_for_selector(".cart_item, [data-test='cart-item']", timeout=10000)
 
 def get_cart_items(page) -> List[str]:
-    name_nodes = page.locator(
-        "[data-test='inventory-item-name'], .inventory_item_name, [class*='inventory_item_name']"
+    # One CDP call for every cart name; open_cart already waited for .cart_item.
+    items = page.eval_on_selector_all(
+        "[data-test='inventory-item-name'], .inventory_item_name, [class*='inventory_item_name']",
+        "els => els.map(e => e.innerText.trim()).filter(Boolean)",
     )
-    count = name_nodes.count()
-    items = []
-    for i in range(count):
-        node = name_nodes.nth(i)
-        try:
-            node.wait_for(timeout=1500)
-            txt = node.inner_text().strip()
-            if txt:
-                items.append(txt)
-        except Exception:
-            continue
-    return items
-
-def add_many_to_cart(page, product_names: List[str]) -> dict:
+    return sorted(items)
+
+_BULK_ADD_JS = """
+([primary, fallback, addSel, removeSel, badgeSel, idxs]) => {
+    const cards = document.querySelectorAll(primary).length
+        ? document.querySelectorAll(primary) : document.querySelectorAll(fallback);
+    const before = parseInt(document.querySelector(badgeSel)?.innerText || "0", 10) || 0;
+    const seen = new Set();
+    const statuses = idxs.map(i => {
+        const card = cards[i];
+        if (seen.has(i) || card.querySelector(removeSel)) return "already";
+        seen.add(i);
+        const btn = card.querySelector(addSel);
+        if (!btn) return "missing";
+        btn.click();
+        return "added";
+    });
+    return {before, statuses};
+}
+"""
+
+def _bulk_add(page, names_to_add: List[str], *, index: Dict[str, int]) -> List[str]:
+    """
+    Click every Add-to-cart button in one evaluate, then wait once for the badge.
+    All names must be in `index`. Returns a status per name: "added" or "already".
+    """
+    res = page.evaluate(_BULK_ADD_JS, [
+        CARD_SEL_PRIMARY, CARD_SEL_FALLBACK,
+        BTN_ADD_SEL, BTN_REMOVE_SEL,
+        CART_BADGE_SEL, [index[_norm(n)] for n in names_to_add],
+    ])
+    statuses = res["statuses"]
+    if "missing" in statuses:
+        bad = [n for n, st in zip(names_to_add, statuses) if st == "missing"]
+        raise AutomationFailure(f"No Add to cart button for: {'; '.join(bad)}")
+
+    n_added = statuses.count("added")
+    if n_added:
+        # One wait instead of K: the badge must reach the expected total
+        page.wait_for_function(
+            "([sel, n]) => (document.querySelector(sel)?.innerText || '').trim() === String(n)",
+            arg=[CART_BADGE_SEL, res["before"] + n_added],
+            timeout=8000,
+        )
+    return statuses
+
+def add_many_to_cart(page, product_names: List[str], *, index: Dict[str, int]) -> dict:
     added, skipped, notfound = [], [], []
+    # Misses are plain dict lookups; only names that exist touch the page.
+    # (do NOT print NOTFOUND here — we will print a single consolidated line later)
+    to_add = []
     for name in product_names:
-        try:
-            status = add_to_cart_idempotent(page, name)
-            if status == "added":
-                console.print(f"SUCCESS: Added '{name}' to cart")
-                added.append(name)
-            else:
-                console.print(f"SKIP: '{name}' was already in cart")
-                skipped.append(name)
-        except ProductNotFound:
-            # do NOT print here — we will print a single consolidated NOTFOUND later
+        if _norm(name) in index:
+            to_add.append(name)
+        else:
             notfound.append(name)
-        except Exception as e:
-            raise AutomationFailure(f"Failed to add '{name}' to cart: {e}") from e
+    if not to_add:
+        return {'added': added, 'skipped': skipped, 'notfound': notfound}
+
+    try:
+        statuses = _bulk_add(page, to_add, index=index)
+    except Exception as e:
+        raise AutomationFailure(f"Failed to add {'; '.join(to_add)} to cart: {e}") from e
+
+    for name, status in zip(to_add, statuses):
+        if status == "added":
+            console.print(f"SUCCESS: Added '{name}' to cart")
+            added.append(name)
+        else:
+            console.print(f"SKIP: '{name}' was already in cart")
+            skipped.append(name)
     return {'added': added, 'skipped': skipped, 'notfound': notfound}
 
 # ---------------- Checkout ---------------
@@ -244,26 +298,13 @@ def fill_checkout_info(page, first: str, last: str, postal: str):
     page.wait_for_selector(f"{TOTAL_SEL}, {SUBTOTAL_SEL}", timeout=10000)
 
 def read_checkout_totals(page):
-    def read_text(sel, default=""):
-        loc = page.locator(sel).first
-        if loc.count() == 0:
-            return default
-        try:
-            loc.wait_for(timeout=5000)
-            txt = loc.inner_text().strip()
-            return txt
-        except Exception:
-            return default
-
-    subtotal = read_text(SUBTOTAL_SEL)
-    tax      = read_text(TAX_SEL)
-    total    = read_text(TOTAL_SEL)
-
-    import re
-    def amt(s):
-        m = re.search(r"\$[0-9]+(?:\.[0-9]{2})?", s or "")
-        return m.group(0) if m else ""
-    sub_amt = amt(subtotal); tax_amt = amt(tax); total_amt = amt(total)
+    # One CDP call for all three labels; fill_checkout_info already waited for the summary.
+    subtotal, tax, total = page.evaluate(
+        "sels => sels.map(s => (document.querySelector(s)?.innerText || '').trim())",
+        [SUBTOTAL_SEL, TAX_SEL, TOTAL_SEL],
+    )
+
+    sub_amt = _amount(subtotal); tax_amt = _amount(tax); total_amt = _amount(total)
 
     console.print(f"CHECKOUT: item_total={sub_amt}")
     console.print(f"CHECKOUT: tax={tax_amt}")
@@ -281,13 +322,35 @@ def finish_checkout(page):
     return msg
 
 # --------------- Orchestration ----------
+BLOCKED_RESOURCE_TYPES = ("image", "font", "media")
+BLOCKED_HOSTS = ("google-analytics.com", "googletagmanager.com", "backtrace.io")
+
+def _route_filter(route):
+    # We never read images/fonts or talk to trackers; aborting them gets pages ready sooner.
+    req = route.request
+    host = urlparse(req.url).hostname or ""
+    if req.resource_type in BLOCKED_RESOURCE_TYPES or host.endswith(BLOCKED_HOSTS):
+        return route.abort()
+    return route.continue_()
+
+def open_browser(p, headful: bool = False):
+    # Reuse an already-running Chromium (e.g. the test suite's shared one) when PW_CDP_WS is set;
+    # each run still gets its own fresh context, so cookies/cart never leak between runs.
+    ws = os.getenv("PW_CDP_WS", "")
+    if ws:
+        return p.chromium.connect_over_cdp(ws)
+    return p.chromium.launch(headless=not headful, args=CHROMIUM_ARGS)
+
 def run(product_names: List[str], headful: bool = False,
         add_to_cart_flag: bool = False, do_checkout: bool = False,
         first_name: str = "", last_name: str = "", postal: str = "") -> int:
 
+    global SCROLL_INTO_VIEW
     load_dotenv(override=False)
+    SCROLL_INTO_VIEW = headful or os.getenv("PW_NO_SCROLL", "1") != "1"
 
     app_url = os.getenv("APP_URL", "https://www.saucedemo.com/")
+    state_path = Path(os.getenv("PW_STATE_PATH", str(DEFAULT_STATE_PATH)))
     username = os.getenv("APP_USERNAME", "")
     password = os.getenv("APP_PASSWORD", "")
 
@@ -305,35 +368,45 @@ def run(product_names: List[str], headful: bool = False,
     page = None
     try:
         with sync_playwright() as p:
-            browser = p.chromium.launch(headless=not headful, args=["--disable-dev-shm-usage"])
-            context = browser.new_context()
+            # SauceDemo marks elements with data-test, not Playwright's default data-testid
+            p.selectors.set_test_id_attribute("data-test")
+            browser = open_browser(p, headful)
+            # Session cache is opt-in both ways: PW_SAVE_STATE=1 loads and saves it
+            use_state = os.getenv("PW_SAVE_STATE") == "1"
+            state = load_session(state_path, app_url, username) if use_state else None
+            context = browser.new_context(storage_state=state)
+            context.route("**/*", _route_filter)
             page = context.new_page()
             page.set_default_timeout(15000)
 
-            goto_with_retry(page, app_url)
-            login(page, username, password)
+            # Saved session -> straight to inventory; expired/missing -> normal login
+            if not (state and restore_session(page, app_url)):
+                goto_with_retry(page, app_url, ready_selector=USERNAME_SEL)
+                login(page, username, password)
+                if use_state:
+                    # Saved right after login, so the stored cart is always empty
+                    save_session(context, state_path, app_url, username)
 
-            # Price report (don’t print NOTFOUND here; we consolidate later)
-            page.wait_for_selector(f"{CARD_SEL_PRIMARY}, {CARD_SEL_FALLBACK}", timeout=15000)
-            if _cards_locator(page).count() == 0:
-                raise AutomationFailure("No inventory items found after login")
+            # One inventory read; raises AutomationFailure if no cards are present
+            cards = _read_inventory(page)
+            name_index = _build_name_index(cards)
 
+            # Price report is pure dict lookups (don’t print NOTFOUND here; we consolidate later)
+            prices = _price_map(cards)
             notfound_seen: List[str] = []
             for name in product_names:
-                try:
-                    price = extract_price_for(page, name)
-                    console.print(f"SUCCESS: Product '{name}' costs {price}")
-                except ProductNotFound:
+                price = prices.get(_norm(name))
+                if price is None:
                     notfound_seen.append(name)
-                except Exception as e:
-                    raise AutomationFailure(f"Failed to get price for '{name}': {e}") from e
+                else:
+                    console.print(f"SUCCESS: Product '{name}' costs {price}")
 
             exit_code = 0
 
             # ---------- Add requested products ----------
             if add_to_cart_flag:
-                summary = add_many_to_cart(page, product_names)
-                notfound_all = list(set(notfound_seen + summary["notfound"]))
+                summary = add_many_to_cart(page, product_names, index=name_index)
+                notfound_all = list(dict.fromkeys(notfound_seen + summary["notfound"]))
                 cart_count = len(summary["added"]) + len(summary["skipped"])
 
                 # NOTHING in cart -> skip cart/checkout cleanly
@@ -350,7 +423,7 @@ def run(product_names: List[str], headful: bool = False,
                 open_cart(page)
                 items = get_cart_items(page)
                 console.print(f"CART: total_items={len(items)}")
-                console.print("CART: items=[" + "; ".join(sorted(items)) + "]")
+                console.print("CART: items=[" + "; ".join(items) + "]")
 
                 # Checkout only if cart non-empty
                 if do_checkout:
@@ -365,21 +438,16 @@ def run(product_names: List[str], headful: bool = False,
                 # No add-to-cart requested
                 if do_checkout:
                     # Try opening cart; if empty -> skip
-                    try:
-                        open_cart(page)
-                        items = get_cart_items(page)
-                        if len(items) == 0:
-                            console.print("CHECKOUT: skipped (cart empty)")
-                            browser.close()
-                            return 0
-                        click_checkout(page)
-                        fill_checkout_info(page, first_name, last_name, postal)
-                        read_checkout_totals(page)
-                        finish_checkout(page)
-                    except ProductNotFound:
-                        _print_notfound(notfound_seen)
+                    open_cart(page)
+                    items = get_cart_items(page)
+                    if len(items) == 0:
+                        console.print("CHECKOUT: skipped (cart empty)")
                         browser.close()
-                        return 3
+                        return 0
+                    click_checkout(page)
+                    fill_checkout_info(page, first_name, last_name, postal)
+                    read_checkout_totals(page)
+                    finish_checkout(page)
 
             # If we saw notfound during price lookups but didn't add, report once
             if not add_to_cart_flag and notfound_seen:
@@ -389,11 +457,6 @@ def run(product_names: List[str], headful: bool = False,
             browser.close()
             return exit_code
 
-    except ProductNotFound as e:
-        # Defensive: most paths already consolidate before reaching here
-        _print_notfound([str(e).replace("Product '", "").replace("' not found", "")])
-        if page: save_artifacts(page, "notfound")
-        return 3
     except (PWTimeoutError, PWError, AutomationFailure) as e:
         console.print(f"AUTOMATION FAILED: {e}")
         if page: save_artifacts(page, "failure")
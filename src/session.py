@@ -0,0 +1,29 @@
+# Saved login session (cookies + localStorage) on disk, reused to skip the login form.
+# Pure file/JSON helpers with no Playwright import, so tests can exercise them directly.
+import json
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+
+# Overridable via PW_STATE_PATH (resolved in run(), after .env is loaded).
+DEFAULT_STATE_PATH = Path(".cache") / "storage.json"
+
+def session_owner(app_url: str, username: str) -> dict:
+    u = urlparse(app_url)
+    return {"origin": f"{u.scheme}://{u.netloc}", "username": username}
+
+def load_session(path: Path, app_url: str, username: str) -> Optional[dict]:
+    """Saved storage_state for this user + site, or None (missing, unreadable, or someone else's)."""
+    try:
+        saved = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(saved, dict) or saved.get("owner") != session_owner(app_url, username):
+        return None
+    return saved.get("state")
+
+def save_session(context, path: Path, app_url: str, username: str) -> None:
+    # Owner is stored next to the state so a .env change (user/host) never reuses it
+    path.parent.mkdir(parents=True, exist_ok=True)
+    saved = {"owner": session_owner(app_url, username), "state": context.storage_state()}
+    path.write_text(json.dumps(saved), encoding="utf-8")
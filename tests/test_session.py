@@ -0,0 +1,52 @@
+import json
+
+from src.session import load_session, save_session, session_owner
+
+URL = "https://www.saucedemo.com/"
+USER = "standard_user"
+STATE = {"cookies": [{"name": "session-username", "value": USER}], "origins": []}
+
+class FakeContext:
+    """Stands in for a BrowserContext; only storage_state() is used."""
+    def storage_state(self):
+        return STATE
+
+def write(path, data):
+    path.write_text(data if isinstance(data, str) else json.dumps(data), encoding="utf-8")
+    return path
+
+# ---------- session_owner ----------
+
+def test_owner_uses_origin_not_full_url():
+    assert session_owner("https://www.saucedemo.com/inventory.html", USER) == session_owner(URL, USER)
+    assert session_owner(URL, USER) == {"origin": "https://www.saucedemo.com", "username": USER}
+
+# ---------- load_session / save_session ----------
+
+def test_save_then_load_roundtrip(tmp_path):
+    path = tmp_path / "nested" / "storage.json"
+    save_session(FakeContext(), path, URL, USER)
+    assert load_session(path, URL, USER) == STATE
+
+def test_load_missing_file_returns_none(tmp_path):
+    assert load_session(tmp_path / "nope.json", URL, USER) is None
+
+def test_load_corrupt_json_returns_none(tmp_path):
+    assert load_session(write(tmp_path / "s.json", "{not json"), URL, USER) is None
+
+def test_load_non_dict_returns_none(tmp_path):
+    assert load_session(write(tmp_path / "s.json", [1, 2, 3]), URL, USER) is None
+
+def test_load_other_user_returns_none(tmp_path):
+    path = tmp_path / "s.json"
+    save_session(FakeContext(), path, URL, USER)
+    assert load_session(path, URL, "problem_user") is None
+
+def test_load_other_host_returns_none(tmp_path):
+    path = tmp_path / "s.json"
+    save_session(FakeContext(), path, URL, USER)
+    assert load_session(path, "https://staging.example.com/", USER) is None
+
+def test_load_plain_storage_state_without_owner_returns_none(tmp_path):
+    # A bare Playwright storage_state file (no owner tag) is never trusted
+    assert load_session(write(tmp_path / "s.json", STATE), URL, USER) is None
@@ -1,18 +1,86 @@
 import os
 import re
 import sys
+import time
 import subprocess
 from pathlib import Path
 
+import pytest
+
+from src.browser_flags import CHROMIUM_ARGS
+
 PROJ_ROOT = Path(__file__).resolve().parents[1]
 ENV = os.environ.copy()
+ENV.setdefault("PW_SAVE_STATE", "1")   # first run logs in and saves the session; later runs reuse it
+
+# Under pytest-xdist each worker gets its own browser + saved session (no shared files to race on)
+WORKER_ID = os.getenv("PYTEST_XDIST_WORKER", "main")
+ENV.setdefault("PW_STATE_PATH", str(PROJ_ROOT / ".cache" / f"storage-{WORKER_ID}.json"))
+
+@pytest.fixture(scope="session")
+def shared_browser(tmp_path_factory):
+    """
+    Launch one headless Chromium per session (i.e. per xdist worker) and yield its CDP
+    endpoint, so browser tests don't each pay a cold browser start.
+    An outer PW_CDP_WS is reused as-is.
+    """
+    if ENV.get("PW_CDP_WS"):
+        yield ENV["PW_CDP_WS"]
+        return
+
+    from playwright.sync_api import sync_playwright
+    with sync_playwright() as p:
+        exe = p.chromium.executable_path
+
+    profile = tmp_path_factory.mktemp("chromium-profile")
+    proc = subprocess.Popen(
+        [exe, "--headless=new", "--remote-debugging-port=0", f"--user-data-dir={profile}",
+         *CHROMIUM_ARGS, "about:blank"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
 
-def run_cmd(args, timeout=180):
+    # Chromium writes "<port>\n<ws path>" here once the endpoint is listening.
+    port_file = profile / "DevToolsActivePort"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        lines = port_file.read_text().split() if port_file.exists() else []
+        if len(lines) >= 2:
+            break
+        time.sleep(0.1)
+    else:
+        proc.kill()
+        pytest.fail("Shared Chromium did not expose a CDP endpoint within 30s")
+
+    try:
+        yield f"ws://127.0.0.1:{lines[0]}{lines[1]}"
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+@pytest.fixture
+def browser_env(shared_browser):
+    """Env for CLI runs that attach to the shared browser via PW_CDP_WS."""
+    return {**ENV, "PW_CDP_WS": shared_browser}
+
+def launch_env():
+    """
+    Env for CLI runs that launch their own Chromium (the real, non-CDP CLI path) and
+    always log in through the form (PW_SAVE_STATE=0: no saved session is loaded).
+    """
+    env = {k: v for k, v in ENV.items() if k != "PW_CDP_WS"}
+    env["PW_SAVE_STATE"] = "0"
+    return env
+
+def run_cmd(args, timeout=180, env=None):
     """Run a command in project root and capture combined stdout/stderr."""
     return subprocess.run(
         args,
         cwd=str(PROJ_ROOT),
-        env=ENV,
+        env=ENV if env is None else env,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         text=True,
@@ -30,21 +98,21 @@ def assert_exit(code_expected, res):
 # ---------- Tests ----------
 
 def test_price_only_success():
-    """Price-only lookup for a known product should succeed and exit 0."""
+    """Price-only lookup for a known product should succeed and exit 0 (own browser launch + real login)."""
     cmd = [sys.executable, "-m", "src.main",
            "--product", "Sauce Labs Backpack",
            "--quiet"]
-    res = run_cmd(cmd)
+    res = run_cmd(cmd, env=launch_env())
     assert_exit(0, res)
     assert_line(r"^SUCCESS: Product 'Sauce Labs Backpack' costs \$\d+\.\d{2}$", res.stdout)
 
-def test_add_to_cart_multi_and_cart_summary():
+def test_add_to_cart_multi_and_cart_summary(browser_env):
     """Add multiple products, verify cart summary."""
     cmd = [sys.executable, "-m", "src.main",
            "--products", "Sauce Labs Backpack, Sauce Labs Bike Light",
            "--add-to-cart",
            "--quiet"]
-    res = run_cmd(cmd)
+    res = run_cmd(cmd, env=browser_env)
     assert_exit(0, res)
     # success lines for each product price
     assert_line(r"^SUCCESS: Product 'Sauce Labs Backpack' costs \$\d+\.\d{2}$", res.stdout)
@@ -57,7 +125,7 @@ def test_add_to_cart_multi_and_cart_summary():
     # order of items is sorted in output
     assert_line(r"^CART: items=\[(?:.+; )?Sauce Labs Backpack; Sauce Labs Bike Light\]$", res.stdout)
 
-def test_checkout_e2e_finish():
+def test_checkout_e2e_finish(browser_env):
     """Full checkout: add two items, fill form, verify totals and finish page."""
     cmd = [sys.executable, "-m", "src.main",
            "--products", "Sauce Labs Backpack, Sauce Labs Bike Light",
@@ -67,7 +135,7 @@ def test_checkout_e2e_finish():
            "--last-name", "Patel",
            "--postal", "95050",
            "--quiet"]
-    res = run_cmd(cmd, timeout=240)
+    res = run_cmd(cmd, timeout=240, env=browser_env)
     assert_exit(0, res)
     # pre-checkout confirmations exist
     assert_line(r"^CART: total_items=\d+$", res.stdout)
@@ -79,7 +147,7 @@ def test_checkout_e2e_finish():
     assert_line(r"^CHECKOUT: total=\$\d+\.\d{2}$", res.stdout)
     assert_line(r"^ORDER: success=", res.stdout)  # message text can vary slightly; presence is enough
 
-def test_notfound_auto_skip_checkout():
+def test_notfound_auto_skip_checkout(browser_env):
     """
     If no requested products exist, we should:
       - Print a single consolidated NOTFOUND line
@@ -94,7 +162,7 @@ def test_notfound_auto_skip_checkout():
            "--last-name", "Patel",
            "--postal", "95050",
            "--quiet"]
-    res = run_cmd(cmd)
+    res = run_cmd(cmd, env=browser_env)
     assert_exit(3, res)
     # single consolidated NOTFOUND line
     assert_line(r"^NOTFOUND: Product 'Sauce Labs Light' not found$", res.stdout)